@@ -0,0 +1,58 @@
+import random
+import string
+import time
+
+from region_matcher import RegionMatcher
+
+
+# Function to build a synthetic wire-service dump and region list
+def make_dataset(item_count=20000, region_count=300, seed=42):
+    rng = random.Random(seed)
+
+    def word(min_len=3, max_len=10):
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(min_len, max_len)))
+
+    regions = [word(5, 12).capitalize() for _ in range(region_count)]
+    news_items = []
+    for _ in range(item_count):
+        title = " ".join(word() for _ in range(rng.randint(6, 14)))
+        description = " ".join(word() for _ in range(rng.randint(30, 60)))
+        # Roughly one item in ten mentions a region
+        if rng.random() < 0.1:
+            description += " " + rng.choice(regions)
+        news_items.append({"title": title, "description": description, "url": "https://example.com"})
+    return news_items, regions
+
+
+# The loop create_script used before the matcher was introduced
+def filter_with_loop(news_items, regions):
+    return [item for item in news_items
+            if any(region in item.get('title', '') or region in item.get('description', '') for region in regions)]
+
+
+def filter_with_matcher(news_items, regions):
+    matcher = RegionMatcher(regions)
+    return [item for item, _ in matcher.filter_items(news_items)]
+
+
+def main():
+    for item_count, region_count in [(10000, 50), (20000, 300), (50000, 500)]:
+        news_items, regions = make_dataset(item_count, region_count)
+
+        start = time.perf_counter()
+        loop_result = filter_with_loop(news_items, regions)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher_result = filter_with_matcher(news_items, regions)
+        matcher_seconds = time.perf_counter() - start
+
+        assert [id(item) for item in loop_result] == [id(item) for item in matcher_result]
+        print(f"{item_count} items x {region_count} regions: "
+              f"loop {loop_seconds:.2f}s, matcher {matcher_seconds:.2f}s, "
+              f"speedup {loop_seconds / matcher_seconds:.1f}x ({len(matcher_result)} matched)")
+
+
+# Run the benchmark
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import time
+import shutil
+import tempfile
+
+import numpy as np
+from PIL import Image
+from moviepy import AudioClip
+
+from generate_videos import create_video
+from renditions import Rendition
+
+
+# Function to create random still images and a silent voiceover for the benchmark
+def make_assets(folder, image_count=2):
+    rng = np.random.default_rng(42)
+    images = []
+    for index in range(image_count):
+        path = os.path.join(folder, f"image_{index}.jpg")
+        Image.fromarray(rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)).save(path)
+        images.append(path)
+    voiceover_path = os.path.join(folder, "voiceover.mp3")
+    AudioClip(lambda t: np.zeros((len(np.atleast_1d(t)), 2)), duration=10 * image_count, fps=44100).write_audiofile(
+        voiceover_path, fps=44100, logger=None)
+    return images, voiceover_path
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="benchmark_renditions_")
+    try:
+        images, voiceover_path = make_assets(folder)
+        renditions = [
+            Rendition.from_preset("youtube", os.path.join(folder, "youtube.mp4")),
+            Rendition.from_preset("shorts", os.path.join(folder, "shorts.mp4")),
+            Rendition.from_preset("square", os.path.join(folder, "square.mp4")),
+        ]
+
+        start = time.perf_counter()
+        create_video(images, [], voiceover_path, os.path.join(folder, "single.mp4"))
+        single_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        create_video(images, [], voiceover_path, None, renditions=renditions)
+        multi_seconds = time.perf_counter() - start
+
+        for rendition in renditions:
+            assert os.path.exists(rendition.output_filename), rendition.output_filename
+        print(f"One output: {single_seconds:.1f}s")
+        print(f"Three renditions in one pass: {multi_seconds:.1f}s "
+              f"({multi_seconds / single_seconds:.2f}x a single output)")
+    finally:
+        shutil.rmtree(folder)
+
+
+# Run the benchmark
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,12 @@ from moviepy.video.fx.CrossFadeIn import CrossFadeIn
 from moviepy.video.fx.CrossFadeOut import CrossFadeOut
 from moviepy.video.VideoClip import TextClip
 
+import tracing
+from motion import ken_burns_clip
+from renditions import master_height, write_renditions
+
 # Set up logging to a file
-logging.basicConfig(filename='video_creation.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+tracing.setup_logging('video_creation.log')
 
 def load_visuals(visuals_folder, max_images=20, max_videos=10):
     """
@@ -57,14 +60,28 @@ def load_subtitles(subtitles_file):
         logging.error(f"Error reading subtitles file: {e}")
     return subtitles
 
-def create_video(image_path, voiceover_path, output_filename, background_music_path=None, subtitles_file=None):
+@tracing.traced("render.create_video")
+def create_video(image_path, voiceover_path, output_filename, background_music_path=None, subtitles_file=None,
+                 renditions=None, motion=None):
     """
     Create a video using a single image and a voiceover.
+    If renditions are given, every rendition is encoded from the same pass instead of output_filename.
+    If a KenBurns motion is given, the image pans and zooms over the length of the voiceover.
     """
+    # With several renditions, composite tall enough that none of them is scaled up
+    height = master_height(renditions, [image_path])
     try:
         # Load the image
-        image_clip = ImageClip(image_path, duration=1000)
-        image_clip = Resize(height=1080).apply(image_clip)  # Resize to fit the video dimensions
+        if motion is not None:
+            # Spread the motion over the voiceover, which sets the final video length
+            duration = 1000
+            if os.path.exists(voiceover_path):
+                with AudioFileClip(voiceover_path) as voiceover:
+                    duration = voiceover.duration
+            image_clip = ken_burns_clip(image_path, duration, motion, height)
+        else:
+            image_clip = ImageClip(image_path, duration=1000)
+            image_clip = Resize(height=height).apply(image_clip)  # Resize to fit the video dimensions
         image_clip = FadeIn(1).apply(image_clip)
         image_clip = FadeOut(1).apply(image_clip)
         final_clip = image_clip
@@ -77,8 +94,9 @@ def create_video(image_path, voiceover_path, output_filename, background_music_p
         subtitles = load_subtitles(subtitles_file)
         for text, start, end in subtitles:
             try:
-                subtitle_clip = TextClip(font='Arial', text=text, font_size=44, duration=end - start, color='black',
-                                             size=(1920, 100), margin=(None, None), bg_color=None, stroke_color='black',
+                scale = height / 1080
+                subtitle_clip = TextClip(font='Arial', text=text, font_size=round(44 * scale), duration=end - start,
+                                             color='black', size=(final_clip.w, round(100 * scale)), margin=(None, None), bg_color=None, stroke_color='black',
                                              stroke_width=10, method='caption', text_align='center',
                                              horizontal_align='center', vertical_align='center', interline=4,
                                              transparent=False)
@@ -117,11 +135,17 @@ def create_video(image_path, voiceover_path, output_filename, background_music_p
 
     # Write the output video file
     try:
-        final_clip.write_videofile(output_filename, fps=24, codec="libx264", audio_codec="aac")
+        if renditions:
+            write_renditions(final_clip, renditions, fps=24, codec="libx264", audio_codec="aac")
+        else:
+            with tracing.span("render.encode", output=output_filename):
+                final_clip.write_videofile(output_filename, fps=24, codec="libx264", audio_codec="aac")
+            tracing.count("frames_encoded", int(final_clip.duration * 24))
     except Exception as e:
         logging.error(f"Error writing video file {output_filename}: {e}")
 
 # Main script
+@tracing.traced("stage.audio_book")
 def main():
     visuals_folder = "visuals"
     english_voiceover_path = f"book_summary_english_voiceover_{date.today().strftime('%Y-%m-%d')}.mp3"
@@ -158,4 +182,8 @@ def main():
 
 # Run the script
 if __name__ == "__main__":
-    main()
+    # Failed runs exit early, and they need the report most
+    try:
+        main()
+    finally:
+        tracing.finish_run()
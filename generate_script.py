@@ -15,9 +15,11 @@ from datetime import date
 import os
 import logging
 
+import tracing
+from region_matcher import RegionMatcher
+
 # Set up logging to a file
-logging.basicConfig(filename='script_generation.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+tracing.setup_logging('script_generation.log')
 
 # Load environment variables from .env file
 load_dotenv()
@@ -31,7 +33,23 @@ genai.configure(api_key=API_KEY)
 # Set the desired video length in minutes
 video_length_minutes = 1
 
+# Function to call Gemini inside a traced span, counting characters and tokens
+def generate_content(model, prompt):
+    with tracing.span("gemini.generate_content", prompt_chars=len(prompt)) as attributes:
+        tracing.count("gemini_requests")
+        tracing.count("gemini_prompt_chars", len(prompt))
+        response = model.generate_content(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            tracing.count("gemini_prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0)
+            tracing.count("gemini_response_tokens", getattr(usage, "candidates_token_count", 0) or 0)
+        tracing.count("gemini_response_chars", len(response.text))
+        attributes["response_chars"] = len(response.text)
+        return response
+
+
 # Function to create an attractive script from the news
+@tracing.traced("script.create")
 def create_script(news_items, regions, video_length_minutes, prompt, intro, sub_intro, outro):
     script_lines = []
     script_lines.append(intro)
@@ -43,23 +61,23 @@ def create_script(news_items, regions, video_length_minutes, prompt, intro, sub_
     total_seconds = video_length_minutes * 60
     estimated_time_per_item = 20  # Assuming each news item takes roughly 20 seconds to present
 
-    for item in news_items:
-        if any(region in item.get('title', '') or region in item.get('description', '') for region in regions):
-            title = item.get('title', 'No Title')
-            description = item.get('description', 'No Description')
-            url = item.get('url', 'No URL')
-            script_lines.append(f"• {title} - {description} Source: {url}")
-            script_lines.append("\n")
-            item_count += 1
+    # Build the region matcher once so each item is scanned in a single pass
+    matcher = RegionMatcher(regions)
+    for item, matched_regions in matcher.filter_items(news_items):
+        logging.debug(f"News item matched regions: {', '.join(matched_regions)}")
+        title = item.get('title', 'No Title')
+        description = item.get('description', 'No Description')
+        url = item.get('url', 'No URL')
+        script_lines.append(f"• {title} - {description} Source: {url}")
+        script_lines.append("\n")
+        item_count += 1
 
     # Add filler content if there are not enough news items to reach the desired video length
     model = genai.GenerativeModel("gemini-1.5-flash")
     keywords = []
     while item_count * estimated_time_per_item < total_seconds:
         try:
-            filler_content = model.generate_content(
-                prompt
-            )
+            filler_content = generate_content(model, prompt)
             response_text = filler_content.text
             script_part, keyword_part = response_text.split('keyWordsForImages', 1)
             script_lines.append("\n")
@@ -88,10 +106,12 @@ def save_keywords(keywords, filename):
 
 
 # Function to translate script to Arabic
+@tracing.traced("script.translate_arabic")
 def translate_script_to_arabic(script_content):
     model = genai.GenerativeModel("gemini-1.5-flash")
     try:
-        translation_content = model.generate_content(
+        translation_content = generate_content(
+            model,
             f"Translate the following English text to Egyptian Arabic:\n{script_content}"
             "Critical:  Make sure that there is no '*' in the script and only arabic is allowed."
         )
@@ -101,10 +121,12 @@ def translate_script_to_arabic(script_content):
         return "Error generating Arabic translation. Please check the logs."
 
 # Function to translate script to German
+@tracing.traced("script.translate_german")
 def translate_script_to_german(script_content):
     model = genai.GenerativeModel("gemini-1.5-flash")
     try:
-        translation_content = model.generate_content(
+        translation_content = generate_content(
+            model,
             f"Translate the following English text to German:\n{script_content}"
             "Critical:  Make sure that there is no '*' in the script and only german is allowed."
         )
@@ -113,8 +135,31 @@ def translate_script_to_german(script_content):
         logging.error(f"Error generating German translation: {e}")
         return "Error generating Arabic translation. Please check the logs."
 
-# Main script
-def main():
+
+# Translation function for each target language
+TRANSLATORS = {
+    "arabic": translate_script_to_arabic,
+    "german": translate_script_to_german,
+}
+
+
+# Function to translate a saved script into one language, so each translation can run as its own stage
+def write_translation(language, script_filename, translation_filename):
+    with open(script_filename, "r", encoding="utf-8") as file:
+        script_content = file.read()
+
+    logging.info(f"Translating the script to {language.capitalize()}.")
+    translation = TRANSLATORS[language](script_content)
+
+    with open(translation_filename, "w", encoding="utf-8") as file:
+        file.write(translation)
+
+    logging.info(f"The {language.capitalize()} translation file '{translation_filename}' has been created and is ready!")
+    print(f"The {language.capitalize()} translation file '{translation_filename}' has been created and is ready!")
+
+
+# Function to generate today's script and image search keywords
+def write_script(today):
     # prompt = "Provide a concise and informative summary of maximum 2 lines about the current European conflict developments without repeating introductory phrases. Focus on war and conflict events in Europe, key updates, and notable diplomatic activities, ensuring a continuous and engaging flow throughout the segment. The tone should be authoritative and engaging. Include a few keywords at the end under the title 'keyWordsForImages'."
     # prompt = "Create a concise and informative 3-line motivational text aimed at professionals, for a viral Instagram and YouTube video that motivates professionals to stop procrastinating and become more active. Start with a compelling hook to grab attention instantly, followed by relatable examples, quick actionable tips, and an energetic tone. Conclude with a strong call-to-action to inspire viewers to take immediate steps and share the video. The tone should be authoritative and engaging. Ensure that the response does not include any special characters except for ?, !, and. Make sure that there is no * in the script. Include keywords at the end under the title 'keyWordsForImages' every keyword in separate line without any special character."
     prompt = ("Summarize atomic Habits book in maximum 10 lines, in a professional and engaging way, highlighting the main points, key techniques, and central topics covered. Provide clear explanations of the concepts and actionable takeaways where applicable. Ensure the summary captures the essence of the book while maintaining an authoritative and captivating tone suitable for professional readers."
@@ -131,7 +176,6 @@ def main():
     script_content, keywords = create_script([], [], video_length_minutes, prompt, intro, sub_intro, outro)
     logging.info("We are creating the script file. It can take up to 1 minute!")
     # Save the script to a .txt file with today's date
-    today = date.today().strftime("%Y-%m-%d")
     script_filename = f"book_summary_script_{today}.txt"
 
     with open(script_filename, "w", encoding="utf-8") as file:
@@ -146,29 +190,24 @@ def main():
     logging.info(f"The keywords file '{keywords_filename}' has been created and is ready!")
     print(f"The keywords file '{keywords_filename}' has been created and is ready!")
 
-    # Generate Arabic translation of the script
-    logging.info("Translating the script to Arabic.")
-    arabic_translation = translate_script_to_arabic(script_content)
-    translation_filename = f"book_summary_script_arabic_{today}.txt"
-
-    with open(translation_filename, "w", encoding="utf-8") as file:
-        file.write(arabic_translation)
-
-    logging.info(f"The Arabic translation file '{translation_filename}' has been created and is ready!")
-    print(f"The Arabic translation file '{translation_filename}' has been created and is ready!")
+    return script_filename
 
-    # Generate German translation of the script
-    logging.info("Translating the script to German.")
-    german_translation = translate_script_to_german(script_content)
-    german_translation_filename = f"book_summary_script_german_{today}.txt"
 
-    with open(german_translation_filename, "w", encoding="utf-8") as file:
-        file.write(german_translation)
+# Main script
+@tracing.traced("stage.script")
+def main():
+    today = date.today().strftime("%Y-%m-%d")
+    script_filename = write_script(today)
 
-    logging.info(f"The German translation file '{german_translation_filename}' has been created and is ready!")
-    print(f"The German translation file '{german_translation_filename}' has been created and is ready!")
+    # Generate the Arabic and German translations of the script
+    for language in ("arabic", "german"):
+        write_translation(language, script_filename, f"book_summary_script_{language}_{today}.txt")
 
 
 # Run the script
 if __name__ == "__main__":
-    main()
+    # Failed runs exit early, and they need the report most
+    try:
+        main()
+    finally:
+        tracing.finish_run()
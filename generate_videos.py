@@ -11,9 +11,12 @@ from moviepy.video.fx.CrossFadeIn import CrossFadeIn
 from moviepy.video.fx.CrossFadeOut import CrossFadeOut
 from moviepy.video.VideoClip import TextClip
 
+import tracing
+from motion import ken_burns_clip
+from renditions import master_height, write_renditions
+
 # Set up logging to a file
-logging.basicConfig(filename='video_creation.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+tracing.setup_logging('video_creation.log')
 
 def load_visuals(visuals_folder, max_images=20, max_videos=10):
     """
@@ -58,17 +61,29 @@ def load_subtitles(subtitles_file):
         logging.error(f"Error reading subtitles file: {e}")
     return subtitles
 
-def create_video(images, videos, voiceover_path, output_filename, background_music_path=None, subtitles_file=None):
+@tracing.traced("render.create_video")
+def create_video(images, videos, voiceover_path, output_filename, background_music_path=None, subtitles_file=None,
+                 renditions=None, motion=None):
     """
     Create a video using images, videos, and a voiceover.
+    If renditions are given, every rendition is encoded from the same pass instead of output_filename.
+    motion is a KenBurns setting for all images, or a list with one setting (or None for a still) per image.
     """
+    if isinstance(motion, (list, tuple)) and len(motion) != len(images):
+        raise ValueError(f"Got {len(motion)} motion settings for {len(images)} images.")
     clips = []
+    # With several renditions, composite tall enough that none of them is scaled up
+    height = master_height(renditions, images)
 
     # Add images as clips with effects, ensuring each scene is at least 10 seconds
-    for image_path in images:
+    for index, image_path in enumerate(images):
         try:
-            image_clip = ImageClip(image_path, duration=10)
-            image_clip = Resize(height=1080).apply(image_clip)  # Resize to fit the video dimensions
+            image_motion = motion[index] if isinstance(motion, (list, tuple)) else motion
+            if image_motion is not None:
+                image_clip = ken_burns_clip(image_path, 10, image_motion, height)
+            else:
+                image_clip = ImageClip(image_path, duration=10)
+                image_clip = Resize(height=height).apply(image_clip)  # Resize to fit the video dimensions
             image_clip = FadeIn(1).apply(image_clip)
             image_clip = FadeOut(1).apply(image_clip)
             clips.append(image_clip)
@@ -134,11 +149,17 @@ def create_video(images, videos, voiceover_path, output_filename, background_mus
 
     # Write the output video file
     try:
-        final_clip.write_videofile(output_filename, fps=24, codec="libx264", audio_codec="aac")
+        if renditions:
+            write_renditions(final_clip, renditions, fps=24, codec="libx264", audio_codec="aac")
+        else:
+            with tracing.span("render.encode", output=output_filename):
+                final_clip.write_videofile(output_filename, fps=24, codec="libx264", audio_codec="aac")
+            tracing.count("frames_encoded", int(final_clip.duration * 24))
     except Exception as e:
         logging.error(f"Error writing video file {output_filename}: {e}")
 
 # Main script
+@tracing.traced("stage.video")
 def main():
     visuals_folder = "visuals"
     voiceover_path = f"book_summary_arabic_voiceover_{date.today().strftime('%Y-%m-%d')}.mp3"
@@ -156,4 +177,8 @@ def main():
 
 # Run the script
 if __name__ == "__main__":
-    main()
+    # Failed runs exit early, and they need the report most
+    try:
+        main()
+    finally:
+        tracing.finish_run()
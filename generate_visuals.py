@@ -5,12 +5,14 @@ from datetime import date
 import logging
 import re
 
+import tracing
+
 # Set up logging to a file
-logging.basicConfig(filename='visuals_download.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+tracing.setup_logging('visuals_download.log')
 
 
 # Function to search Bing for images using web scraping
+@tracing.traced("bing.search")
 def bing_search(query, search_type="images"):
     if search_type == "images":
         search_url = f"https://www.bing.com/images/search?q={query.replace(' ', '+')}&form=HDRSC2"
@@ -23,6 +25,8 @@ def bing_search(query, search_type="images"):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"}
         response = requests.get(search_url, headers=headers)
         response.raise_for_status()
+        tracing.count("bing_requests")
+        tracing.count("bytes_downloaded", len(response.content))
         soup = BeautifulSoup(response.text, 'html.parser')
         media_urls = []
 
@@ -40,6 +44,7 @@ def bing_search(query, search_type="images"):
 
 
 # Function to download media from a URL
+@tracing.traced("visuals.download")
 def download_media(url, output_folder, media_type="image"):
     try:
         response = requests.get(url, stream=True)
@@ -49,6 +54,8 @@ def download_media(url, output_folder, media_type="image"):
         with open(file_name, 'wb') as file:
             for chunk in response.iter_content(1024):
                 file.write(chunk)
+                tracing.count("bytes_downloaded", len(chunk))
+        tracing.count(f"{media_type}s_downloaded")
         logging.info(f"{media_type.capitalize()} downloaded successfully: {file_name}")
         print(f"{media_type.capitalize()} downloaded successfully: {file_name}")
         return True
@@ -59,6 +66,7 @@ def download_media(url, output_folder, media_type="image"):
 
 
 # Main script to perform Bing searches and download related visuals
+@tracing.traced("stage.visuals")
 def main():
     today = date.today().strftime("%Y-%m-%d")
     # Read keywords from image_search.txt
@@ -102,4 +110,8 @@ def main():
 
 # Run the script
 if __name__ == "__main__":
-    main()
+    # Failed runs exit early, and they need the report most
+    try:
+        main()
+    finally:
+        tracing.finish_run()
@@ -1,12 +1,22 @@
 import os
+import re
+import json
+import hashlib
 import logging
+import tempfile
 import requests
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from moviepy.config import FFMPEG_BINARY
 from datetime import date
 
+import tracing
+
 # Set up logging to a file
-logging.basicConfig(filename='voiceover_generation.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+tracing.setup_logging('voiceover_generation.log')
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,8 +24,34 @@ load_dotenv()
 # Set up Elevenlabs API key
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
-# Elevenlabs API endpoint
-ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+# Elevenlabs API endpoint (override to point at a local stub server)
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}")
+
+# Synthesis settings, all part of the per-sentence cache key
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.5
+}
+
+# Sentences are requested as raw 16-bit mono PCM so they can be joined sample-exactly
+ELEVENLABS_OUTPUT_FORMAT = "pcm_44100"
+ELEVENLABS_SAMPLE_RATE = 44100
+
+# Directory holding one synthesized PCM chunk per sentence
+VOICEOVER_CACHE_DIR = os.getenv("VOICEOVER_CACHE_DIR", "voiceover_cache")
+
+# Maximum number of synthesis requests in flight at once
+MAX_IN_FLIGHT = int(os.getenv("ELEVENLABS_MAX_IN_FLIGHT", "4"))
+
+# Longest text sent in a single request; longer sentences are split on whitespace
+MAX_SENTENCE_CHARS = 1000
+
+# Shorter fragments (e.g. a split after "Dr." or "D.C.") are joined to the next sentence
+MIN_SENTENCE_CHARS = 40
+
+# Sentence boundaries: Latin and Arabic terminators followed by whitespace, or blank lines
+SENTENCE_END = re.compile(r'(?<=[.!?؟…])\s+|\n\s*\n')
 
 
 # Function to read the script from a text file in chunks
@@ -35,50 +71,193 @@ def read_script_in_chunks(script_filename, chunk_size=1000):
         exit(1)
 
 
-# Function to generate voiceover using Elevenlabs API in chunks
-def generate_voiceover(script_filename, output_filename):
-    headers = {
+# Function to split streamed script chunks into sentences of at least min_chars where possible
+def split_into_sentences(chunks, max_chars=MAX_SENTENCE_CHARS, min_chars=MIN_SENTENCE_CHARS):
+    short = ""
+    for sentence in _split_on_terminators(chunks, max_chars):
+        if short and len(short) + 1 + len(sentence) > max_chars:
+            yield short
+            short = ""
+        sentence = f"{short} {sentence}" if short else sentence
+        if len(sentence) < min_chars:
+            short = sentence
+        else:
+            short = ""
+            yield sentence
+    if short:
+        yield short
+
+
+def _split_on_terminators(chunks, max_chars):
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        parts = SENTENCE_END.split(pending)
+        # The last part may continue in the next chunk
+        pending = parts.pop()
+        for part in parts:
+            yield from _limit_length(part.strip(), max_chars)
+    yield from _limit_length(pending.strip(), max_chars)
+
+
+def _limit_length(sentence, max_chars):
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield sentence[:cut].strip()
+        sentence = sentence[cut:].strip()
+    if sentence:
+        yield sentence
+
+
+# Function to compute the cache key of a synthesized sentence
+def chunk_cache_key(text, voice_id, model_id=ELEVENLABS_MODEL_ID, voice_settings=None, previous_text=None,
+                    next_text=None):
+    if voice_settings is None:
+        voice_settings = ELEVENLABS_VOICE_SETTINGS
+    # The surrounding sentences change the intonation, so they are part of the key
+    key_source = json.dumps([text, voice_id, model_id, voice_settings, previous_text, next_text], sort_keys=True,
+                            ensure_ascii=False)
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+# Function to create a pooled HTTP session for concurrent synthesis requests
+def create_session(max_in_flight=MAX_IN_FLIGHT):
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
         'xi-api-key': ELEVENLABS_API_KEY,
-        'Accept': 'audio/mpeg',
+        'Accept': '*/*',
         'Content-Type': 'application/json'
+    })
+    return session
+
+
+# Function to synthesize one sentence, reusing the cached PCM chunk when present
+def synthesize_chunk(session, url, text, voice_id, cache_dir=VOICEOVER_CACHE_DIR, parent_id=None, previous_text=None,
+                     next_text=None):
+    cache_key = chunk_cache_key(text, voice_id, previous_text=previous_text, next_text=next_text)
+    cache_path = os.path.join(cache_dir, f"{cache_key}.pcm")
+    if os.path.exists(cache_path):
+        tracing.count("elevenlabs_cache_hits")
+        return cache_path, False
+
+    payload = {
+        "text": text,
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
     }
+    # Neighbouring sentences let each request continue the intonation of the one before
+    if previous_text:
+        payload["previous_text"] = previous_text
+    if next_text:
+        payload["next_text"] = next_text
+    with tracing.span("elevenlabs.synthesize", parent_id=parent_id, chars=len(text)) as attributes:
+        tracing.count("elevenlabs_requests")
+        tracing.count("elevenlabs_characters", len(text))
+        response = session.post(url, params={"output_format": ELEVENLABS_OUTPUT_FORMAT}, json=payload, stream=True)
+        response.raise_for_status()
 
+        # Write to a temporary file first so an interrupted run never leaves a partial cache entry
+        descriptor, temp_path = tempfile.mkstemp(suffix=".part", dir=cache_dir)
+        size = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as audio_file:
+                for chunk in response.iter_content(chunk_size=1024):
+                    if chunk:
+                        audio_file.write(chunk)
+                        size += len(chunk)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        tracing.count("bytes_downloaded", size)
+        attributes["bytes"] = size
+    return cache_path, True
+
+
+# Function to join raw PCM chunks and encode them to MP3 in a single pass
+def join_pcm_chunks(chunk_paths, output_filename, sample_rate=ELEVENLABS_SAMPLE_RATE, bitrate="128k"):
+    """
+    Concatenate 16-bit mono PCM chunks and encode the result once, so sentence boundaries
+    carry no encoder priming or padding silence.
+    """
+    command = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "-",
+        "-c:a", "libmp3lame", "-b:a", bitrate, output_filename,
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        for chunk_path in chunk_paths:
+            with open(chunk_path, 'rb') as chunk_file:
+                data = chunk_file.read()
+            # A stray odd byte would shift every later sample
+            process.stdin.write(data[:len(data) - len(data) % 2])
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        returncode = process.wait()
+    if returncode != 0:
+        if os.path.exists(output_filename):
+            os.remove(output_filename)
+        raise RuntimeError(f"Encoding '{output_filename}' failed: ffmpeg exited with {returncode}")
+
+
+# Function to generate voiceover using Elevenlabs API in sentence chunks
+@tracing.traced("voiceover.generate")
+def generate_voiceover(script_filename, output_filename, max_in_flight=MAX_IN_FLIGHT, cache_dir=VOICEOVER_CACHE_DIR):
     voice_id = os.getenv("ELEVENLABS_VOICE_ID", "Brian")
     url = ELEVENLABS_API_URL.format(voice_id=voice_id)
 
+    sentences = list(split_into_sentences(read_script_in_chunks(script_filename)))
+    if not sentences:
+        logging.error(f"Script file '{script_filename}' is empty.")
+        exit(1)
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Worker threads do not inherit the current span, so hand it over explicitly
+    parent_id = tracing.current_span_id()
     try:
-        with open(script_filename, "r", encoding="utf-8") as script_file:
-            script_content = script_file.read()
-            payload = {
-                "text": script_content,
-                "model_id": "eleven_multilingual_v2",
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.5
-                }
-            }
-            response = requests.post(url, headers=headers, json=payload, stream=True)
-            response.raise_for_status()
-
-            with open(output_filename, 'wb') as audio_file:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        audio_file.write(chunk)
+        # Each sentence is synthesized with its neighbours as context
+        requests_in_order = [(sentences[index - 1] if index else None, text,
+                              sentences[index + 1] if index + 1 < len(sentences) else None)
+                             for index, text in enumerate(sentences)]
+        # Repeated sentences in the same context share a cache entry, so synthesize each once
+        unique_requests = list(dict.fromkeys(requests_in_order))
+        with create_session(max_in_flight) as session, ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            # map keeps sentence order, the pool bounds the number of requests in flight
+            results = dict(zip(unique_requests, executor.map(
+                lambda request: synthesize_chunk(session, url, request[1], voice_id, cache_dir, parent_id,
+                                                 previous_text=request[0], next_text=request[2]),
+                unique_requests)))
+        with tracing.span("voiceover.join", chunks=len(sentences)):
+            join_pcm_chunks([results[request][0] for request in requests_in_order], output_filename)
+        synthesized = sum(1 for _, created in results.values() if created)
+        logging.info(f"Synthesized {synthesized} of {len(sentences)} sentences, "
+                     f"{len(sentences) - synthesized} reused from cache.")
         logging.info(f"Voiceover generated and saved to '{output_filename}' successfully.")
         print(f"Voiceover generated and saved to '{output_filename}' successfully.")
     except requests.exceptions.RequestException as e:
         logging.error(f"Error generating voiceover: {e}")
         print(f"Error generating voiceover. Please check the logs.")
         exit(1)
-    except FileNotFoundError:
-        logging.error(f"Script file '{script_filename}' not found.")
-        exit(1)
     except Exception as e:
         logging.error(f"Error generating voiceover: {e}")
         exit(1)
 
 
 # Main script
+@tracing.traced("stage.voiceover")
 def main():
     # Define the script file and output file names
     today = date.today().strftime("%Y-%m-%d")
@@ -99,4 +278,8 @@ def main():
 
 # Run the script
 if __name__ == "__main__":
-    main()
+    # Failed runs exit early, and they need the report most
+    try:
+        main()
+    finally:
+        tracing.finish_run()
@@ -0,0 +1,136 @@
+import math
+import numpy as np
+from PIL import Image
+from moviepy import VideoClip
+
+import tracing
+
+# Output height used when no size is given, matching Resize(height=1080) in create_video
+DEFAULT_HEIGHT = 1080
+
+# Easing curves mapping linear progress in [0, 1] to eased progress in [0, 1]
+EASINGS = {
+    "linear": lambda p: p,
+    "ease_in": lambda p: p * p,
+    "ease_out": lambda p: 1 - (1 - p) * (1 - p),
+    "ease_in_out": lambda p: p * p * (3 - 2 * p),
+}
+
+
+class KenBurns:
+    """
+    Pan and zoom settings for one still image.
+
+    Rectangles are (x, y, width, height) as fractions of the image; explicit rectangles
+    are shrunk around their centre to the output's aspect ratio. Without them, rectangles
+    are derived from a zoom factor and a centre point. easing is a name from EASINGS or a
+    callable.
+    """
+
+    def __init__(self, start_zoom=1.0, end_zoom=1.15, start_center=(0.5, 0.5), end_center=(0.5, 0.5),
+                 easing="ease_in_out", start_rect=None, end_rect=None, size=None):
+        # The crop box must stay on the image, so no zooming out past the full frame
+        if start_zoom < 1 or end_zoom < 1:
+            raise ValueError(f"Zoom factors must be at least 1, got {start_zoom} and {end_zoom}.")
+        for rect in (start_rect, end_rect):
+            if rect is not None:
+                x, y, width, height = rect
+                if x < 0 or y < 0 or width <= 0 or height <= 0 or x + width > 1 or y + height > 1:
+                    raise ValueError(f"Rectangle {rect} must lie within the image (fractions in [0, 1]).")
+        self.start_zoom = start_zoom
+        self.end_zoom = end_zoom
+        self.start_center = start_center
+        self.end_center = end_center
+        self.easing = EASINGS[easing] if isinstance(easing, str) else easing
+        self.start_rect = start_rect
+        self.end_rect = end_rect
+        self.size = size
+
+    def output_size(self, image_width, image_height, height=DEFAULT_HEIGHT):
+        if self.size:
+            width, height = self.size
+        else:
+            width = round(image_width * height / image_height)
+        return width - width % 2, height - height % 2
+
+    def rects(self, image_width, image_height, output_width, output_height):
+        """
+        Return the start and end rectangles in image pixels.
+        """
+        return (self._rect(self.start_rect, self.start_zoom, self.start_center, image_width, image_height,
+                           output_width, output_height),
+                self._rect(self.end_rect, self.end_zoom, self.end_center, image_width, image_height,
+                           output_width, output_height))
+
+    @staticmethod
+    def _rect(rect, zoom, center, image_width, image_height, output_width, output_height):
+        aspect = output_width / output_height
+        if rect is not None:
+            x, y, width, height = (rect[0] * image_width, rect[1] * image_height,
+                                   rect[2] * image_width, rect[3] * image_height)
+            # Shrink the rectangle around its centre to the output's aspect ratio so the image is not stretched
+            fitted_width = min(width, height * aspect)
+            fitted_height = fitted_width / aspect
+            return (x + (width - fitted_width) / 2, y + (height - fitted_height) / 2,
+                    fitted_width, fitted_height)
+        # Largest rectangle with the output's aspect ratio that fits the image, shrunk by the zoom
+        width = min(image_width, image_height * aspect) / zoom
+        height = width / aspect
+        x = min(max(center[0] * image_width - width / 2, 0), image_width - width)
+        y = min(max(center[1] * image_height - height / 2, 0), image_height - height)
+        return x, y, width, height
+
+
+# Function to build an image pyramid, halving the resolution at each level
+def build_pyramid(image, min_size=64):
+    levels = [image.convert("RGB")]
+    while min(levels[-1].size) // 2 >= min_size:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+class PyramidRenderer:
+    """
+    Renders sub-pixel crops of an image at a fixed output size.
+
+    Each frame reads from the smallest pyramid level that still has at least one pixel per
+    output pixel, so a single bilinear resample of the cropped box never has to shrink by
+    more than 2x.
+    """
+
+    def __init__(self, image, output_width, output_height):
+        self.levels = build_pyramid(image)
+        self.image_width, self.image_height = image.size
+        self.output_width = output_width
+        self.output_height = output_height
+
+    def render(self, x, y, width, height):
+        source_per_output = min(width / self.output_width, height / self.output_height)
+        index = int(math.floor(math.log2(source_per_output))) if source_per_output > 1 else 0
+        level = self.levels[min(index, len(self.levels) - 1)]
+        scale_x = level.width / self.image_width
+        scale_y = level.height / self.image_height
+        # resize with a float box crops and resamples in one pass, keeping sub-pixel positions
+        box = (max(x * scale_x, 0.0), max(y * scale_y, 0.0),
+               min((x + width) * scale_x, level.width), min((y + height) * scale_y, level.height))
+        frame = level.resize((self.output_width, self.output_height), Image.BILINEAR, box=box)
+        return np.asarray(frame)
+
+
+# Function to create a pan/zoom clip from a still image
+@tracing.traced("motion.build")
+def ken_burns_clip(image_path, duration, motion=None, height=DEFAULT_HEIGHT):
+    if motion is None:
+        motion = KenBurns()
+    with Image.open(image_path) as image:
+        image.load()
+        output_width, output_height = motion.output_size(*image.size, height)
+        renderer = PyramidRenderer(image, output_width, output_height)
+    start, end = motion.rects(renderer.image_width, renderer.image_height, output_width, output_height)
+
+    def frame_function(t):
+        progress = motion.easing(min(max(t / duration, 0.0), 1.0)) if duration else 0.0
+        rect = [a + (b - a) * progress for a, b in zip(start, end)]
+        return renderer.render(*rect)
+
+    return VideoClip(frame_function, duration=duration)
@@ -0,0 +1,289 @@
+import os
+import time
+import logging
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import tracing
+
+# Set up logging to a file
+tracing.setup_logging('pipeline.log')
+
+# Default number of stages allowed to hold each resource at the same time
+DEFAULT_LIMITS = {
+    "network": 4,
+    "cpu": max(1, (os.cpu_count() or 2) // 2),
+}
+
+
+class Stage:
+    """
+    A pipeline stage: a module-level function plus the file artifacts it reads and writes.
+
+    Stages using the "cpu" resource run in worker processes, all others in threads,
+    so the function and its arguments must be picklable.
+    """
+
+    def __init__(self, name, func, args=(), inputs=(), outputs=(), resource="network"):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.resource = resource
+        self.dependencies = set()
+        self.status = "pending"
+        self.start = None
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def is_up_to_date(self):
+        """
+        Return True if every output exists and is newer than every existing input.
+        """
+        if not self.outputs or not all(os.path.exists(path) for path in self.outputs):
+            return False
+        input_times = [os.path.getmtime(path) for path in self.inputs if os.path.exists(path)]
+        if not input_times:
+            return True
+        return min(os.path.getmtime(path) for path in self.outputs) >= max(input_times)
+
+
+# Function to link stages through the artifacts they produce and consume
+def resolve_dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"Artifact '{output}' is produced by both '{producers[output].name}' and '{stage.name}'.")
+            producers[output] = stage
+
+    for stage in stages:
+        for path in stage.inputs:
+            producer = producers.get(path)
+            if producer is not None and producer is not stage:
+                stage.dependencies.add(producer.name)
+            elif producer is None and not os.path.exists(path):
+                logging.warning(f"Stage '{stage.name}' reads '{path}', which no stage produces and does not exist yet.")
+
+    # Reject cycles up front so the scheduler can never stall
+    order = topological_order(stages)
+    if len(order) != len(stages):
+        raise ValueError("The pipeline stages contain a dependency cycle.")
+    return order
+
+
+def topological_order(stages):
+    by_name = {stage.name: stage for stage in stages}
+    remaining = {stage.name: set(stage.dependencies) for stage in stages}
+    order = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            break
+        for name in ready:
+            order.append(by_name[name])
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+
+# Function to run the stages concurrently as soon as their dependencies are done
+def run_pipeline(stages, limits=None, force=False):
+    limits = dict(DEFAULT_LIMITS, **(limits or {}))
+    order = resolve_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    in_use = {resource: 0 for resource in limits}
+
+    thread_pool = ThreadPoolExecutor(max_workers=max(limits.values()))
+    process_pool = ProcessPoolExecutor(max_workers=limits["cpu"])
+    run_start = time.perf_counter()
+    running = {}
+    try:
+        while True:
+            for stage in order:
+                if stage.status != "pending":
+                    continue
+                dep_statuses = [by_name[name].status for name in stage.dependencies]
+                if any(status in ("failed", "skipped") for status in dep_statuses):
+                    stage.status = "skipped"
+                    logging.error(f"Skipping stage '{stage.name}' because a dependency did not complete.")
+                    continue
+                if not all(status in ("done", "cached") for status in dep_statuses):
+                    continue
+                if not force and stage.is_up_to_date():
+                    stage.status = "cached"
+                    logging.info(f"Stage '{stage.name}' is up to date.")
+                    continue
+                limit = limits.get(stage.resource, 1)
+                if in_use.get(stage.resource, 0) >= limit:
+                    continue
+
+                in_use[stage.resource] = in_use.get(stage.resource, 0) + 1
+                stage.status = "running"
+                stage.start = time.perf_counter() - run_start
+                pool = process_pool if stage.resource == "cpu" else thread_pool
+                running[pool.submit(tracing.run_in_span, f"pipeline.{stage.name}", tracing.current_span_id(),
+                                    stage.func, *stage.args)] = stage
+                logging.info(f"Started stage '{stage.name}' ({stage.resource}).")
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                stage.end = time.perf_counter() - run_start
+                in_use[stage.resource] -= 1
+                try:
+                    future.result()
+                    stage.status = "done"
+                    logging.info(f"Finished stage '{stage.name}' in {stage.duration:.1f}s.")
+                except BaseException as e:
+                    stage.status = "failed"
+                    stage.error = e
+                    logging.error(f"Stage '{stage.name}' failed: {e!r}")
+    finally:
+        thread_pool.shutdown(wait=True)
+        process_pool.shutdown(wait=True)
+
+    wall_time = time.perf_counter() - run_start
+    return order, wall_time
+
+
+# Function to find the chain of dependent stages with the longest total duration
+def critical_path(order):
+    by_name = {stage.name: stage for stage in order}
+    finish = {}
+    previous = {}
+    for stage in order:
+        best = None
+        for name in stage.dependencies:
+            if best is None or finish[name] > finish[best]:
+                best = name
+        finish[stage.name] = stage.duration + (finish[best] if best else 0.0)
+        previous[stage.name] = best
+    if not finish:
+        return [], 0.0
+
+    name = max(finish, key=finish.get)
+    length = finish[name]
+    path = []
+    while name:
+        path.append(by_name[name])
+        name = previous[name]
+    return list(reversed(path)), length
+
+
+# Function to print per-stage timings and the critical path
+def report(order, wall_time):
+    lines = ["Stage                     Status    Start(s)  Duration(s)"]
+    for stage in sorted(order, key=lambda s: (s.start is None, s.start or 0.0)):
+        start = f"{stage.start:8.1f}" if stage.start is not None else "       -"
+        lines.append(f"{stage.name:<25} {stage.status:<9} {start}  {stage.duration:11.1f}")
+
+    path, length = critical_path(order)
+    total = sum(stage.duration for stage in order)
+    lines.append("")
+    lines.append(f"Critical path ({length:.1f}s): {' -> '.join(stage.name for stage in path) or '-'}")
+    lines.append(f"Wall-clock time: {wall_time:.1f}s, sum of stage times: {total:.1f}s")
+    summary = "\n".join(lines)
+    logging.info(f"Pipeline report:\n{summary}")
+    print(summary)
+    return summary
+
+
+# Stage functions import their module lazily so each worker configures only what it needs
+def run_script_stage(today):
+    import generate_script
+    generate_script.write_script(today)
+
+
+def run_translation_stage(language, script_filename, translation_filename):
+    import generate_script
+    generate_script.write_translation(language, script_filename, translation_filename)
+
+
+def run_visuals_stage():
+    import generate_visuals
+    generate_visuals.main()
+
+
+def run_voiceover_stage(script_filename, output_filename):
+    import generate_voiceover
+    generate_voiceover.generate_voiceover(script_filename, output_filename)
+
+
+def run_render_stage(visuals_folder, voiceover_path, output_filename, background_music_path, subtitles_file):
+    import generate_audio_book
+    images, _ = generate_audio_book.load_visuals(visuals_folder)
+    if not images:
+        raise RuntimeError(f"No images found in '{visuals_folder}'.")
+    generate_audio_book.create_video(images[0], voiceover_path, output_filename, background_music_path,
+                                     subtitles_file)
+    if not os.path.exists(output_filename):
+        raise RuntimeError(f"Rendering did not produce '{output_filename}'.")
+
+
+# Function to describe the daily book-summary batch as a stage graph
+def build_daily_pipeline(today=None, languages=("german", "arabic"), visuals_folder="visuals",
+                         background_music_path="background_music.mp3"):
+    if today is None:
+        today = date.today().strftime("%Y-%m-%d")
+    script_filename = f"book_summary_script_{today}.txt"
+    keywords_filename = f"image_search_{today}.txt"
+    translations = {
+        "arabic": f"book_summary_script_arabic_{today}.txt",
+        "german": f"book_summary_script_german_{today}.txt",
+    }
+
+    stages = [
+        Stage("script", run_script_stage, args=(today,), outputs=[script_filename, keywords_filename]),
+        Stage("visuals", run_visuals_stage, inputs=[keywords_filename], outputs=[visuals_folder]),
+    ]
+    for language in languages:
+        # Each language's chain starts as soon as its own translation is ready
+        stages.append(Stage(f"translate_{language}", run_translation_stage,
+                            args=(language, script_filename, translations[language]),
+                            inputs=[script_filename], outputs=[translations[language]]))
+        voiceover_path = f"book_summary_{language}_voiceover_{today}.mp3"
+        output_filename = f"{language}_book_summary_video_{today}.mp4"
+        stages.append(Stage(f"voiceover_{language}", run_voiceover_stage,
+                            args=(translations[language], voiceover_path),
+                            inputs=[translations[language]], outputs=[voiceover_path]))
+        stages.append(Stage(f"render_{language}", run_render_stage,
+                            args=(visuals_folder, voiceover_path, output_filename, background_music_path,
+                                  script_filename),
+                            inputs=[visuals_folder, voiceover_path, background_music_path, script_filename],
+                            outputs=[output_filename], resource="cpu"))
+    return stages
+
+
+# Main script
+def main():
+    stages = build_daily_pipeline()
+    try:
+        with tracing.span("pipeline.run"):
+            order, wall_time = run_pipeline(stages)
+        report(order, wall_time)
+    finally:
+        tracing.finish_run()
+
+    # Exit non-zero so cron or CI sees an incomplete daily run as a failure
+    incomplete = [stage.name for stage in order if stage.status in ("failed", "skipped")]
+    if incomplete:
+        logging.error(f"Pipeline incomplete, failed or skipped stages: {', '.join(incomplete)}")
+        print(f"Pipeline incomplete, failed or skipped stages: {', '.join(incomplete)}")
+        exit(1)
+
+
+# Run the script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import logging
+from collections import deque
+
+# Fields of a news item that are scanned for region names
+DEFAULT_FIELDS = ("title", "description")
+
+
+class RegionMatcher:
+    """
+    Multi-keyword matcher (Aho-Corasick) built once per region list.
+
+    Scanning a text costs one pass over its characters no matter how many
+    regions are registered, instead of one substring search per region.
+    """
+
+    def __init__(self, regions):
+        self.regions = []
+        # Trie stored as parallel lists indexed by node id
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        seen = set()
+        for region in regions:
+            if not region or region in seen:
+                continue
+            seen.add(region)
+            self._add(region, len(self.regions))
+            self.regions.append(region)
+        self._build()
+
+    def _add(self, region, index):
+        node = 0
+        for char in region:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] = self._output[node] + (index,)
+
+    def _build(self):
+        # Breadth-first pass to set failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def match_indexes(self, text, found=None):
+        """
+        Return the set of region indexes occurring anywhere in the text.
+        """
+        if found is None:
+            found = set()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+    def match(self, text):
+        """
+        Return the regions occurring in the text, in registration order.
+        """
+        return [self.regions[index] for index in sorted(self.match_indexes(text))]
+
+    def match_item(self, item, fields=DEFAULT_FIELDS):
+        """
+        Return the regions mentioned in any of the given fields of a news item.
+        """
+        found = set()
+        for field in fields:
+            value = item.get(field)
+            if value:
+                self.match_indexes(value, found)
+        return [self.regions[index] for index in sorted(found)]
+
+    def filter_items(self, news_items, fields=DEFAULT_FIELDS):
+        """
+        Yield (item, matched_regions) for each news item mentioning at least one region.
+        """
+        for item in news_items:
+            matched = self.match_item(item, fields)
+            if matched:
+                yield item, matched
+
+
+def iter_news_items(feed_filename, chunk_size=65536):
+    """
+    Stream news items from a JSON array file or a JSON-lines file without loading it fully.
+    Malformed JSON-lines records are logged and skipped; a malformed array ends the stream.
+    """
+    try:
+        with open(feed_filename, "r", encoding="utf-8") as file:
+            first = ""
+            while not first.strip():
+                more = file.read(chunk_size)
+                if not more:
+                    return
+                first += more
+            if first.lstrip().startswith("["):
+                yield from _iter_array_items(file, first, feed_filename, chunk_size)
+            else:
+                file.seek(0)
+                yield from _iter_json_lines(file, feed_filename)
+    except FileNotFoundError:
+        logging.error(f"News feed '{feed_filename}' not found.")
+
+
+def _iter_json_lines(file, feed_filename):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logging.error(f"Skipping malformed line {line_number} of news feed '{feed_filename}': {e}")
+
+
+# Characters that may still be missing from a literal or escape cut off at the end of the buffer
+TRUNCATION_LOOKAHEAD = 10
+
+
+def _iter_array_items(file, buffer, feed_filename, chunk_size):
+    decoder = json.JSONDecoder()
+    position = _skip_whitespace(buffer, 0) + 1
+    offset = 0
+    at_eof = False
+    while True:
+        position = _skip_separators(buffer, position)
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # A number ending at the buffer end may continue in the next chunk
+            truncated = end == len(buffer) and not at_eof
+        except json.JSONDecodeError as e:
+            truncated = e.msg.startswith("Unterminated string") or len(buffer) - e.pos <= TRUNCATION_LOOKAHEAD
+            if not truncated or at_eof:
+                if buffer[position:].strip():
+                    logging.error(f"Malformed news feed '{feed_filename}' at character {offset + e.pos}: {e.msg}")
+                return
+        if truncated:
+            more = file.read(chunk_size)
+            at_eof = not more
+            # Drop consumed text so memory stays bounded by the chunk size
+            offset += position
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def _skip_whitespace(buffer, position):
+    while position < len(buffer) and buffer[position].isspace():
+        position += 1
+    return position
+
+
+def _skip_separators(buffer, position):
+    while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ","):
+        position += 1
+    return position
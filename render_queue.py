@@ -0,0 +1,387 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+
+import tracing
+from motion import KenBurns
+from renditions import Rendition
+
+# Set up logging to a file
+tracing.setup_logging('render_queue.log')
+
+# Default location of the job queue database
+QUEUE_DB = os.getenv("RENDER_QUEUE_DB", "render_queue.db")
+
+# How long a claimed job stays leased to a worker without a heartbeat
+LEASE_SECONDS = 120
+
+# Seconds to wait before retrying a failed job, multiplied by the attempt number
+RETRY_BACKOFF_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    timings TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    busy_seconds REAL NOT NULL DEFAULT 0,
+    jobs_done INTEGER NOT NULL DEFAULT 0,
+    jobs_failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+# Function to open the queue database, creating the schema on first use
+def connect(db_path=QUEUE_DB):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# Function to add a render job to the queue
+def enqueue(conn, spec, max_attempts=3):
+    """
+    Queue a job. The spec describes the script, its languages, the visuals set and the outputs:
+
+    {"kind": "audio_book", "script": "...txt", "visuals": "visuals",
+     "background_music": "background_music.mp3",
+     "languages": {"german": {"voiceover": "...mp3", "output": "...mp4"}}}
+
+    A language may list "renditions" (see Rendition.from_spec) instead of a single "output",
+    and "motion" holds KenBurns keyword arguments to pan and zoom the images.
+    """
+    validate_spec(spec)
+    now = time.time()
+    cursor = conn.execute(
+        "INSERT INTO jobs (spec, max_attempts, available_at, enqueued_at) VALUES (?, ?, ?, ?)",
+        (json.dumps(spec), max_attempts, now, now))
+    return cursor.lastrowid
+
+
+# Function to reject specs that could never render, before they are retried under backoff
+def validate_spec(spec):
+    if not spec.get("visuals"):
+        raise ValueError("A job needs a 'visuals' folder.")
+    if not spec.get("languages"):
+        raise ValueError("A job needs at least one language with a voiceover and an output.")
+    for language, target in spec["languages"].items():
+        if not target.get("voiceover"):
+            raise ValueError(f"Language '{language}' has no 'voiceover'.")
+        if not target.get("output") and not target.get("renditions"):
+            raise ValueError(f"Language '{language}' needs an 'output' or a list of 'renditions'.")
+        try:
+            for rendition in target.get("renditions", []):
+                Rendition.from_spec(rendition)
+        except KeyError as e:
+            raise ValueError(f"A rendition of language '{language}' is missing {e}.")
+    if spec.get("motion"):
+        try:
+            KenBurns(**spec["motion"])
+        except TypeError as e:
+            raise ValueError(f"Invalid motion settings: {e}")
+
+
+# Function to claim the next available job under a lease
+def claim_job(conn, worker_id, lease_seconds=LEASE_SECONDS):
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # A job whose worker died on its last attempt is failed rather than retried forever
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'lease expired', lease_owner = NULL, "
+            "lease_expires = NULL WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+            (now, now))
+        # Jobs whose worker died are reclaimed once their lease expires
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+            "OR (status = 'running' AND lease_expires < ? AND attempts < max_attempts) ORDER BY id LIMIT 1",
+            (now, now)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+            "lease_expires = ?, started_at = ? WHERE id = ?",
+            (worker_id, now + lease_seconds, now, row["id"]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row["id"], json.loads(row["spec"]), row["attempts"] + 1, row["max_attempts"]
+
+
+def renew_lease(conn, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+    conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                 (time.time() + lease_seconds, job_id, worker_id))
+
+
+def complete_job(conn, job_id, worker_id, duration, timings):
+    conn.execute(
+        "UPDATE jobs SET status = 'done', finished_at = ?, duration = ?, timings = ?, lease_owner = NULL, "
+        "lease_expires = NULL, error = NULL WHERE id = ? AND lease_owner = ?",
+        (time.time(), duration, json.dumps(timings), job_id, worker_id))
+
+
+def fail_job(conn, job_id, worker_id, attempts, max_attempts, duration, error):
+    now = time.time()
+    if attempts < max_attempts:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', available_at = ?, duration = ?, error = ?, lease_owner = NULL, "
+            "lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+            (now + RETRY_BACKOFF_SECONDS * attempts, duration, error, job_id, worker_id))
+    else:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, duration = ?, error = ?, lease_owner = NULL, "
+            "lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+            (now, duration, error, job_id, worker_id))
+
+
+# Function to render every language of a job with the existing create_video functions
+def render_job(spec):
+    timings = {}
+    motion = KenBurns(**spec["motion"]) if spec.get("motion") else None
+    for language, target in spec["languages"].items():
+        output_filename = target.get("output")
+        renditions = [Rendition.from_spec(rendition) for rendition in target.get("renditions", [])]
+        outputs = [rendition.output_filename for rendition in renditions] or [output_filename]
+        for path in outputs:
+            if os.path.exists(path):
+                os.remove(path)
+        start = time.perf_counter()
+        if spec.get("kind", "audio_book") == "audio_book":
+            import generate_audio_book
+            images, _ = generate_audio_book.load_visuals(spec["visuals"])
+            if not images:
+                raise RuntimeError(f"No images found in '{spec['visuals']}'.")
+            generate_audio_book.create_video(images[0], target["voiceover"], output_filename,
+                                             spec.get("background_music"), spec.get("script"), renditions, motion)
+        else:
+            import generate_videos
+            images, videos = generate_videos.load_visuals(spec["visuals"])
+            generate_videos.create_video(images, videos, target["voiceover"], output_filename,
+                                         spec.get("background_music"), spec.get("script"), renditions, motion)
+        # create_video logs its errors instead of raising, so check the result on disk
+        for path in outputs:
+            if not os.path.exists(path):
+                raise RuntimeError(f"Rendering {language} did not produce '{path}'.")
+        timings[language] = time.perf_counter() - start
+    return timings
+
+
+# Function to read the host's available memory in megabytes
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def host_has_capacity(max_load, min_free_memory_mb):
+    if max_load is not None and hasattr(os, "getloadavg"):
+        if os.getloadavg()[0] / (os.cpu_count() or 1) > max_load:
+            return False
+    if min_free_memory_mb is not None:
+        free = available_memory_mb()
+        if free is not None and free < min_free_memory_mb:
+            return False
+    return True
+
+
+# Function run by each worker process: claim, render, record, repeat
+def worker_loop(db_path, worker_index, max_load=None, min_free_memory_mb=None, poll_seconds=5, exit_when_idle=False):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{worker_index}"
+    conn = connect(db_path)
+    now = time.time()
+    conn.execute("INSERT OR REPLACE INTO workers (worker_id, host, started_at, last_seen) VALUES (?, ?, ?, ?)",
+                 (worker_id, socket.gethostname(), now, now))
+    logging.info(f"Worker {worker_id} started.")
+
+    while True:
+        conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (time.time(), worker_id))
+        if not host_has_capacity(max_load, min_free_memory_mb):
+            time.sleep(poll_seconds)
+            continue
+
+        job = claim_job(conn, worker_id)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        job_id, spec, attempts, max_attempts = job
+        logging.info(f"Worker {worker_id} claimed job {job_id} (attempt {attempts} of {max_attempts}).")
+
+        # Keep the lease alive from a separate connection while the render runs
+        stop_heartbeat = threading.Event()
+
+        def heartbeat():
+            heartbeat_conn = connect(db_path)
+            while not stop_heartbeat.wait(LEASE_SECONDS / 3):
+                # A failed renewal must not end the heartbeat, or the lease expires mid-render
+                try:
+                    renew_lease(heartbeat_conn, job_id, worker_id)
+                except Exception as e:
+                    logging.error(f"Error renewing the lease of job {job_id}: {e}")
+            heartbeat_conn.close()
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        start = time.perf_counter()
+        try:
+            with tracing.span("queue.job", job_id=job_id, attempt=attempts):
+                timings = render_job(spec)
+            duration = time.perf_counter() - start
+            complete_job(conn, job_id, worker_id, duration, timings)
+            conn.execute("UPDATE workers SET busy_seconds = busy_seconds + ?, jobs_done = jobs_done + 1 "
+                         "WHERE worker_id = ?", (duration, worker_id))
+            logging.info(f"Job {job_id} finished in {duration:.1f}s.")
+        except BaseException as e:
+            duration = time.perf_counter() - start
+            fail_job(conn, job_id, worker_id, attempts, max_attempts, duration, repr(e))
+            conn.execute("UPDATE workers SET busy_seconds = busy_seconds + ?, jobs_failed = jobs_failed + 1 "
+                         "WHERE worker_id = ?", (duration, worker_id))
+            logging.error(f"Job {job_id} failed: {e!r}")
+            if isinstance(e, KeyboardInterrupt):
+                raise
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+    conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (time.time(), worker_id))
+    conn.close()
+    # Worker processes exit without running atexit hooks
+    tracing.flush_counters()
+    logging.info(f"Worker {worker_id} stopped.")
+
+
+# Function to start a pool of worker processes capped by the host's CPUs
+def run_workers(db_path=QUEUE_DB, workers=None, max_load=None, min_free_memory_mb=None, exit_when_idle=False):
+    cpu_count = os.cpu_count() or 1
+    if workers is None:
+        workers = max(1, cpu_count // 2)
+    workers = min(workers, cpu_count)
+    connect(db_path).close()
+
+    processes = []
+    for index in range(workers):
+        process = multiprocessing.Process(target=worker_loop,
+                                          args=(db_path, index, max_load, min_free_memory_mb),
+                                          kwargs={"exit_when_idle": exit_when_idle})
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+
+
+# Function to summarize queue throughput and worker utilization
+def queue_stats(conn, window_seconds=24 * 3600):
+    since = time.time() - window_seconds
+    counts = {row["status"]: row["count"]
+              for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")}
+    finished = conn.execute(
+        "SELECT COUNT(*) AS count, AVG(duration) AS mean_duration, AVG(started_at - enqueued_at) AS mean_wait "
+        "FROM jobs WHERE status = 'done' AND finished_at >= ?", (since,)).fetchone()
+    workers = []
+    for row in conn.execute("SELECT * FROM workers ORDER BY started_at"):
+        alive = max(row["last_seen"] - row["started_at"], 1e-9)
+        workers.append({
+            "worker_id": row["worker_id"],
+            "host": row["host"],
+            "jobs_done": row["jobs_done"],
+            "jobs_failed": row["jobs_failed"],
+            "utilization": min(1.0, row["busy_seconds"] / alive),
+        })
+    return {
+        "counts": counts,
+        "jobs_per_hour": finished["count"] * 3600 / window_seconds,
+        "mean_duration": finished["mean_duration"],
+        "mean_wait": finished["mean_wait"],
+        "workers": workers,
+    }
+
+
+def print_stats(stats):
+    print("Jobs by status: " + ", ".join(f"{status}={count}" for status, count in sorted(stats["counts"].items())))
+    print(f"Throughput: {stats['jobs_per_hour']:.2f} jobs/hour")
+    if stats["mean_duration"] is not None:
+        print(f"Mean render time: {stats['mean_duration']:.1f}s, mean queue wait: {stats['mean_wait']:.1f}s")
+    for worker in stats["workers"]:
+        print(f"{worker['worker_id']}: {worker['jobs_done']} done, {worker['jobs_failed']} failed, "
+              f"{worker['utilization']:.0%} busy")
+
+
+# Main script
+def main():
+    parser = argparse.ArgumentParser(description="Batch render videos from a local SQLite job queue.")
+    parser.add_argument("--db", default=QUEUE_DB, help="Path to the queue database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Queue the jobs in a JSON file (one spec or a list).")
+    enqueue_parser.add_argument("spec_file")
+    enqueue_parser.add_argument("--max-attempts", type=int, default=3)
+
+    work_parser = commands.add_parser("work", help="Run a pool of worker processes.")
+    work_parser.add_argument("--workers", type=int, default=None)
+    work_parser.add_argument("--max-load", type=float, default=None,
+                             help="Do not claim jobs while the 1-minute load per CPU exceeds this.")
+    work_parser.add_argument("--min-free-memory-mb", type=int, default=None,
+                             help="Do not claim jobs while available memory is below this.")
+    work_parser.add_argument("--exit-when-idle", action="store_true")
+
+    stats_parser = commands.add_parser("stats", help="Show queue throughput and worker utilization.")
+    stats_parser.add_argument("--window-hours", type=float, default=24)
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        with open(args.spec_file, "r", encoding="utf-8") as file:
+            specs = json.load(file)
+        specs = specs if isinstance(specs, list) else [specs]
+        # Check every spec first so a bad one does not leave the file half queued
+        for spec in specs:
+            validate_spec(spec)
+        conn = connect(args.db)
+        for spec in specs:
+            job_id = enqueue(conn, spec, args.max_attempts)
+            print(f"Queued job {job_id}.")
+    elif args.command == "work":
+        try:
+            run_workers(args.db, args.workers, args.max_load, args.min_free_memory_mb, args.exit_when_idle)
+        finally:
+            tracing.finish_run()
+    else:
+        print_stats(queue_stats(connect(args.db), args.window_hours * 3600))
+
+
+# Run the script
+if __name__ == "__main__":
+    main()
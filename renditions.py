@@ -0,0 +1,226 @@
+import os
+import math
+import queue
+import logging
+import tempfile
+import threading
+import subprocess
+from PIL import Image
+from moviepy.config import FFMPEG_BINARY
+
+import tracing
+
+# Platform presets: (aspect ratio, width, height, video bitrate)
+PRESETS = {
+    "youtube": ("16:9", 1920, 1080, "8000k"),
+    "shorts": ("9:16", 1080, 1920, "6000k"),
+    "square": ("1:1", 1080, 1080, "5000k"),
+}
+
+# Frames buffered per encoder before the compositor waits for it
+FRAME_QUEUE_SIZE = 8
+
+
+class Rendition:
+    """
+    One output of a multi-rendition render.
+
+    crop is "crop" (fill the frame, cutting the edges), "pad" (fit inside with
+    black bars) or "scale" (stretch to the target size).
+    """
+
+    def __init__(self, output_filename, width, height, bitrate="5000k", crop="crop", aspect=None):
+        if crop not in ("crop", "pad", "scale"):
+            raise ValueError(f"Unknown crop strategy: {crop}")
+        self.output_filename = output_filename
+        # Encoders need even dimensions for yuv420p
+        self.width = width - width % 2
+        self.height = height - height % 2
+        self.bitrate = bitrate
+        self.crop = crop
+        self.aspect = aspect or f"{self.width}:{self.height}"
+
+    @classmethod
+    def from_preset(cls, preset, output_filename, crop="crop"):
+        aspect, width, height, bitrate = PRESETS[preset]
+        return cls(output_filename, width, height, bitrate, crop, aspect)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """
+        Build a rendition from a dict such as {"preset": "shorts", "output": "x.mp4"}
+        or {"output": "x.mp4", "width": 1080, "height": 1080, "bitrate": "5000k", "crop": "pad"}.
+        """
+        if "preset" in spec:
+            return cls.from_preset(spec["preset"], spec["output"], spec.get("crop", "crop"))
+        return cls(spec["output"], spec["width"], spec["height"], spec.get("bitrate", "5000k"),
+                   spec.get("crop", "crop"), spec.get("aspect"))
+
+    def crop_box(self, source_width, source_height):
+        """
+        Return (x, y, width, height) of the source region fed to this rendition's encoder.
+        """
+        if self.crop != "crop":
+            return 0, 0, source_width, source_height
+        target_ratio = self.width / self.height
+        if source_width / source_height > target_ratio:
+            width = min(source_width, round(source_height * target_ratio))
+            height = source_height
+        else:
+            width = source_width
+            height = min(source_height, round(source_width / target_ratio))
+        width -= width % 2
+        height -= height % 2
+        return (source_width - width) // 2, (source_height - height) // 2, width, height
+
+    def scale_filter(self):
+        if self.crop == "pad":
+            return (f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease:flags=area,"
+                    f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2")
+        return f"scale={self.width}:{self.height}:flags=area"
+
+
+# Function to compute the source height at which no rendition has to be scaled up
+def required_height(renditions, source_aspect):
+    height = 0
+    for rendition in renditions:
+        ratio = rendition.width / rendition.height
+        if rendition.crop == "crop" and ratio > source_aspect:
+            # A wider rendition crops the height, so the source must be taller than the output
+            needed = rendition.height * ratio / source_aspect
+        elif rendition.crop == "pad":
+            needed = min(rendition.height, rendition.width / source_aspect)
+        else:
+            needed = rendition.height
+        height = max(height, needed)
+    height = math.ceil(height)
+    return height + height % 2
+
+
+# Function to pick the composite height for a set of images and renditions
+def master_height(renditions, image_paths, default=1080):
+    """
+    Return the height to composite at so every rendition is cut from at least its own
+    resolution. Without renditions this is the default single-output height.
+    """
+    if not renditions:
+        return default
+    aspects = []
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as image:
+                aspects.append(image.width / image.height)
+        except OSError:
+            continue
+    return max(required_height(renditions, aspect) for aspect in aspects or [16 / 9])
+
+
+def _encoder_command(rendition, input_width, input_height, fps, audio_path, codec, preset, threads):
+    command = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{input_width}x{input_height}", "-r", str(fps), "-i", "-",
+    ]
+    if audio_path:
+        command += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:a", "copy", "-shortest"]
+    command += [
+        "-vf", rendition.scale_filter(),
+        "-c:v", codec, "-b:v", rendition.bitrate, "-preset", preset, "-pix_fmt", "yuv420p",
+    ]
+    if threads:
+        command += ["-threads", str(threads)]
+    command.append(rendition.output_filename)
+    return command
+
+
+def _feed_encoder(process, frames, errors):
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            process.stdin.write(frame)
+    except Exception as e:
+        errors.append(e)
+        # Keep draining so the compositor never blocks on a dead encoder
+        while frames.get() is not None:
+            pass
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+
+# Function to render several renditions of a clip in a single compositing pass
+@tracing.traced("render.encode_renditions")
+def write_renditions(clip, renditions, fps=24, codec="libx264", audio_codec="aac", preset="medium", threads=None):
+    """
+    Composite each frame once at the clip's own resolution, then crop it per rendition and
+    stream it into one ffmpeg encoder per rendition. The audio track is encoded once and
+    copied into every output. If compositing fails, every output is removed.
+
+    Build the clip at master_height(renditions, ...) so no rendition is scaled up.
+    Raises RuntimeError if any encoder fails.
+    """
+    source_width, source_height = clip.size
+    source_width -= source_width % 2
+    source_height -= source_height % 2
+
+    temp_dir = tempfile.mkdtemp(prefix="renditions_")
+    audio_path = None
+    encoders = []
+    completed = False
+    try:
+        if clip.audio is not None:
+            audio_path = os.path.join(temp_dir, "audio.m4a")
+            with tracing.span("render.encode_audio"):
+                clip.audio.with_duration(clip.duration).write_audiofile(audio_path, fps=44100, codec=audio_codec,
+                                                                         logger=None)
+
+        for rendition in renditions:
+            x, y, width, height = rendition.crop_box(source_width, source_height)
+            command = _encoder_command(rendition, width, height, fps, audio_path, codec, preset, threads)
+            process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            frames = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+            errors = []
+            feeder = threading.Thread(target=_feed_encoder, args=(process, frames, errors), daemon=True)
+            feeder.start()
+            encoders.append((rendition, (x, y, width, height), process, frames, feeder, errors))
+
+        frame_count = 0
+        for frame in clip.iter_frames(fps=fps, dtype="uint8"):
+            for _, (x, y, width, height), _, frames, _, _ in encoders:
+                # Slicing is a view; tobytes makes the one copy each encoder needs
+                frames.put(frame[y:y + height, x:x + width, :3].tobytes())
+            frame_count += 1
+        completed = True
+    finally:
+        failed = []
+        if not completed:
+            # Closing stdin would let ffmpeg finish a valid but truncated file, so kill the encoders
+            for _, _, process, _, _, _ in encoders:
+                process.kill()
+        for _, _, _, frames, _, _ in encoders:
+            frames.put(None)
+        for rendition, _, process, _, feeder, errors in encoders:
+            feeder.join()
+            if process.wait() != 0 or errors:
+                if completed:
+                    logging.error(f"Error encoding rendition {rendition.output_filename}: "
+                                  f"ffmpeg exited with {process.returncode} {errors}")
+                failed.append(rendition.output_filename)
+        # A partial file must not pass for a finished render
+        for rendition in renditions:
+            if (failed or not completed) and os.path.exists(rendition.output_filename):
+                os.remove(rendition.output_filename)
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+        os.rmdir(temp_dir)
+
+    if failed:
+        raise RuntimeError(f"Encoding failed for renditions: {', '.join(failed)}")
+
+    tracing.count("frames_encoded", frame_count * len(renditions))
+    logging.info(f"Encoded {frame_count} frames into {len(renditions)} renditions.")
+    return frame_count
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# Directory receiving one JSON-lines trace file per run
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+# Prometheus textfile collector output (node_exporter --collector.textfile.directory)
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", os.path.join(TRACE_DIR, "video_pipeline.prom"))
+
+# Every process of one run shares the run ID through the environment
+RUN_ID = os.environ.setdefault("PIPELINE_RUN_ID",
+                               f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_counters = {}
+_lock = threading.Lock()
+_open_spans = 0
+
+
+# Function to configure a module's log file with the run ID in every line
+def setup_logging(filename):
+    logging.basicConfig(filename=filename, level=logging.INFO,
+                        format=f'%(asctime)s - %(levelname)s - {RUN_ID} - %(message)s')
+
+
+def trace_filename(run_id=RUN_ID):
+    return os.path.join(TRACE_DIR, f"{run_id}.jsonl")
+
+
+def _emit(record):
+    record["run_id"] = RUN_ID
+    record["pid"] = os.getpid()
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _lock:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        # Appends of a single short line are atomic, so processes can share the file
+        with open(trace_filename(), "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+def current_span_id():
+    return _current_span.get()
+
+
+# Function to add to a named counter (bytes, API calls, characters, frames...)
+def count(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def flush_counters():
+    with _lock:
+        values = dict(_counters)
+        _counters.clear()
+    if values:
+        _emit({"type": "counters", "time": time.time(), "values": values})
+
+
+@contextmanager
+def span(name, parent_id=None, **attributes):
+    """
+    Time a block as a span nested under the current one (or under parent_id) and record it.
+    """
+    global _open_spans
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = parent_id or _current_span.get()
+    token = _current_span.set(span_id)
+    with _lock:
+        _open_spans += 1
+    start_time = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        status = f"error: {e!r}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _emit({"type": "span", "name": name, "span_id": span_id, "parent_id": parent_id,
+               "start": start_time, "duration": duration, "status": status, "attributes": attributes})
+        with _lock:
+            _open_spans -= 1
+            outermost = _open_spans == 0
+        # Pool workers never run atexit hooks, so counters are flushed whenever a process goes idle
+        if outermost:
+            flush_counters()
+
+
+def traced(name):
+    """
+    Decorator recording every call of the function as a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Function to run a callable inside a span; module-level so worker processes can unpickle it
+def run_in_span(name, parent_id, func, *args):
+    try:
+        with span(name, parent_id=parent_id):
+            return func(*args)
+    finally:
+        # Pool workers exit without running atexit hooks
+        flush_counters()
+
+
+# Function to load every span and counter recorded for a run
+def load_trace(run_id=RUN_ID):
+    spans = []
+    counters = {}
+    try:
+        with open(trace_filename(run_id), "r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if record["type"] == "span":
+                    spans.append(record)
+                elif record["type"] == "counters":
+                    for name, value in record["values"].items():
+                        counters[name] = counters.get(name, 0) + value
+    except FileNotFoundError:
+        pass
+    return spans, counters
+
+
+def summarize_spans(spans):
+    summary = {}
+    for record in spans:
+        entry = summary.setdefault(record["name"], {"count": 0, "total": 0.0, "max": 0.0, "errors": 0})
+        entry["count"] += 1
+        entry["total"] += record["duration"]
+        entry["max"] = max(entry["max"], record["duration"])
+        if record["status"] != "ok":
+            entry["errors"] += 1
+    return summary
+
+
+def _metric_name(name):
+    return "".join(char if char.isalnum() else "_" for char in name)
+
+
+# Function to write the run's span timings and counters in Prometheus textfile format
+def write_prometheus(run_id=RUN_ID, path=PROMETHEUS_TEXTFILE):
+    spans, counters = load_trace(run_id)
+    summary = summarize_spans(spans)
+    # The run id is exported once; labelling every series with it would create new series each run
+    lines = [
+        "# HELP video_pipeline_last_run_info Identifier of the run these metrics describe.",
+        "# TYPE video_pipeline_last_run_info gauge",
+        f'video_pipeline_last_run_info{{run_id="{run_id}"}} 1',
+        "# HELP video_pipeline_last_run_timestamp_seconds Time the last run finished.",
+        "# TYPE video_pipeline_last_run_timestamp_seconds gauge",
+        f"video_pipeline_last_run_timestamp_seconds {time.time():.3f}",
+        "# HELP video_pipeline_span_seconds Time spent in each pipeline span.",
+        "# TYPE video_pipeline_span_seconds summary",
+    ]
+    for name, entry in sorted(summary.items()):
+        labels = f'span="{name}"'
+        lines.append(f"video_pipeline_span_seconds_sum{{{labels}}} {entry['total']:.6f}")
+        lines.append(f"video_pipeline_span_seconds_count{{{labels}}} {entry['count']}")
+    for name, value in sorted(counters.items()):
+        metric = f"video_pipeline_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Write then rename so the collector never reads a half-written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+# Function to print the run summary: time per span and totals per counter
+def report(run_id=RUN_ID):
+    spans, counters = load_trace(run_id)
+    lines = [f"Run {run_id}", "Span                           Count   Total(s)     Max(s)  Errors"]
+    for name, entry in sorted(summarize_spans(spans).items(), key=lambda item: -item[1]["total"]):
+        lines.append(f"{name:<30} {entry['count']:>5} {entry['total']:>10.2f} {entry['max']:>10.2f} "
+                     f"{entry['errors']:>7}")
+    if counters:
+        lines.append("")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:<30} {value:>12}")
+    summary = "\n".join(lines)
+    print(summary)
+    return summary
+
+
+# Function to end a run: flush counters, export Prometheus metrics and print the report
+def finish_run():
+    flush_counters()
+    write_prometheus()
+    return report()
+
+
+# A forked worker starts with no open spans and none of the parent's unflushed counters
+def _reset_after_fork():
+    global _lock, _open_spans
+    _lock = threading.Lock()
+    _open_spans = 0
+    _counters.clear()
+
+
+atexit.register(flush_counters)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)